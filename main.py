@@ -11,4 +11,9 @@ vna.plot(True, "./testData/0grader3cm.csv", True)
 
 # vna.save_csv("test")
 
+# Printing is slow, so only print every 10th sweep when streaming to stdout.
+# from itertools import islice
+# for data in islice(vna.stream_data(), 0, None, 10):
+#     print(data)
+
 vna.kill()
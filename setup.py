@@ -0,0 +1,32 @@
+import platform
+
+from setuptools import Extension, setup
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    cythonize = None
+
+# Optional C kernel for the magnitude calculation, build it in place with:
+#   python setup.py build_ext --inplace
+# Without Cython, or if compiling fails, the package falls back to NumPy.
+# With -ffast-math gcc vectorizes log10 through glibc's libmvec.
+libraries = ["m"]
+if platform.system() == "Linux" and platform.machine() == "x86_64":
+    libraries.append("mvec")
+
+ext_modules = []
+if cythonize is not None:
+    ext_modules = cythonize(
+        [
+            Extension(
+                "src._magnitude",
+                ["src/_magnitude.pyx"],
+                libraries=libraries,
+                extra_compile_args=["-O3", "-ffast-math", "-march=native"],
+                optional=True,
+            )
+        ]
+    )
+
+setup(ext_modules=ext_modules)
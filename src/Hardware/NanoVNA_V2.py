@@ -19,7 +19,7 @@
 import logging
 import platform
 from struct import pack, unpack_from
-from time import sleep
+from time import monotonic, sleep
 
 from .Serial import Interface
 from .VNA import VNA
@@ -55,6 +55,8 @@ _ADDR_FW_MAJOR = 0xF3
 _ADDR_FW_MINOR = 0xF4
 
 WRITE_SLEEP = 0.05
+# serial timeout while waiting for values, how often an abort is checked
+ABORT_POLL = 0.1
 
 _ADF4350_TXPOWER_DESC_MAP = {
     0: "9dB attenuation",
@@ -171,46 +173,55 @@ class NanoVNA_V2(VNA):
                 # cmd: write register 0x30 to clear FIFO
                 self.serial.write(pack("<BBB", _CMD_WRITE, _ADDR_VALUES_FIFO, 0))
                 sleep(WRITE_SLEEP)
+                # drop values left over from an aborted read
+                self.serial.reset_input_buffer()
                 # clear sweepdata
                 self._sweepdata = [(complex(), complex())] * (self.datapoints + s21hack)
                 pointstodo = self.datapoints + s21hack
                 # we read at most 255 values at a time and the time required
                 # empirically is just over 3 seconds for 101 points or
                 # 7 seconds for 255 points
-                self.serial.timeout = min(pointstodo, 255) * 0.035 + 0.1
-                while pointstodo > 0:
-                    logger.info("reading values")
-                    pointstoread = min(255, pointstodo)
-                    # cmd: read FIFO, addr 0x30
-                    self.serial.write(
-                        pack(
-                            "<BBB",
-                            _CMD_READFIFO,
-                            _ADDR_VALUES_FIFO,
-                            pointstoread,
+                read_timeout = min(pointstodo, 255) * 0.035 + 0.1
+                # read in short pieces, so an abort is noticed while waiting
+                self.serial.timeout = ABORT_POLL
+                try:
+                    while pointstodo > 0 and not self.abort.is_set():
+                        logger.info("reading values")
+                        pointstoread = min(255, pointstodo)
+                        # cmd: read FIFO, addr 0x30
+                        self.serial.write(
+                            pack(
+                                "<BBB",
+                                _CMD_READFIFO,
+                                _ADDR_VALUES_FIFO,
+                                pointstoread,
+                            )
                         )
-                    )
-                    sleep(WRITE_SLEEP)
-                    # each value is 32 bytes
-                    nBytes = pointstoread * 32
-
-                    # serial .read() will try to read nBytes bytes in
-                    # timeout secs
-                    arr = self.serial.read(nBytes)
-                    if nBytes != len(arr):
-                        logger.warning("expected %d bytes, got %d", nBytes, len(arr))
+                        sleep(WRITE_SLEEP)
+                        # each value is 32 bytes
+                        nBytes = pointstoread * 32
+
                         # the way to retry on timeout is keep the data
                         # already read then try to read the rest of
-                        # the data into the array
-                        if nBytes > len(arr):
-                            arr = arr + self.serial.read(nBytes - len(arr))
-                    if nBytes != len(arr):
-                        return []
-
-                    self._read_pointstoread(pointstoread, arr)
-
-                    pointstodo = pointstodo - pointstoread
-            self.serial.timeout = timeout
+                        # the data into the array, so allow twice the time
+                        arr = self._read_fifo(nBytes, 2 * read_timeout)
+                        if nBytes != len(arr):
+                            if not self.abort.is_set():
+                                logger.warning(
+                                    "expected %d bytes, got %d", nBytes, len(arr)
+                                )
+                            # drop what is left of the FIFO data
+                            self.serial.reset_input_buffer()
+                            return []
+
+                        self._read_pointstoread(pointstoread, arr)
+
+                        pointstodo = pointstodo - pointstoread
+                finally:
+                    self.serial.timeout = timeout
+            if pointstodo > 0:
+                logger.debug("Aborted reading values")
+                return []
 
             if s21hack:
                 self._sweepdata = self._sweepdata[1:]
@@ -218,6 +229,16 @@ class NanoVNA_V2(VNA):
         idx = 1 if value == "data 1" else 0
         return [f"{str(x[idx].real)} {str(x[idx].imag)}" for x in self._sweepdata]
 
+    def _read_fifo(self, nBytes: int, timeout: float) -> bytes:
+        """read up to nBytes, stopping early on timeout or abort"""
+        arr = b""
+        deadline = monotonic() + timeout
+        while len(arr) < nBytes and not self.abort.is_set():
+            if monotonic() > deadline:
+                break
+            arr += self.serial.read(nBytes - len(arr))
+        return arr
+
     def resetSweep(self, start: int, stop: int):
         self.setSweep(start, stop)
 
@@ -17,6 +17,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import logging
+import threading
 from time import sleep
 from typing import Iterator
 
@@ -57,6 +58,8 @@ class VNA:
 
     def __init__(self, iface: Interface):
         self.serial = iface
+        # Set to make pending reads give up, e.g. when a sweep is stopped
+        self.abort = threading.Event()
         self.version = Version("0.0.0")
         self.features = set()
         self.validateInput = False
@@ -94,6 +97,8 @@ class VNA:
 
     def exec_command(self, command: str, wait: float = WAIT) -> Iterator[str]:
         logger.debug("exec_command(%s)", command)
+        if self.abort.is_set():
+            return
         with self.serial.lock:
             drain_serial(self.serial)
             self.serial.write(f"{command}\r".encode("ascii"))
@@ -102,6 +107,11 @@ class VNA:
             max_retries = _max_retries(self.bandwidth, self.datapoints)
             logger.debug("Max retries: %s", max_retries)
             while True:
+                if self.abort.is_set():
+                    logger.debug("Aborted %s", command)
+                    # Drop the rest of the response
+                    self.serial.reset_input_buffer()
+                    return
                 line = self.serial.readline()
                 line = line.decode("ascii").strip()
                 if not line:
@@ -0,0 +1,69 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    # Compiled with "python setup.py build_ext --inplace"
+    from ._magnitude import magnitude_db as _magnitude_db_cython
+except ImportError:
+    _magnitude_db_cython = None
+
+if njit is not None:
+
+    @njit(fastmath=True, cache=True)
+    def _magnitude_db_numba(re, im, out):
+        for i in range(re.shape[0]):
+            out[i] = 5.0 * np.log10(max(re[i] * re[i] + im[i] * im[i], 1e-30))
+
+else:
+    _magnitude_db_numba = None
+
+NUMBA_AVAILABLE = _magnitude_db_numba is not None
+
+
+def magnitude_db(re, im, out=None, use_numba=False):
+    """Calculate the magnitude in dB, 10 * log10(|z|), of complex values.
+
+    Uses the fused numba kernel if use_numba is set and numba is installed, the
+    compiled Cython kernel if it has been built, otherwise NumPy.
+
+    Args:
+        re (np.ndarray): Real parts.
+        im (np.ndarray): Imaginary parts.
+        out (np.ndarray, optional): Buffer for the result. It is only used if it
+            matches the shape and type of the result, so the result of the
+            previous call can be passed in every time.
+        use_numba (bool): Use the numba kernel. It avoids NumPy's temporary
+            arrays, but is only faster where numba can vectorize log10 (Intel
+            SVML). Defaults to False.
+
+    Returns:
+        np.ndarray: The magnitude.
+
+    Raises:
+        ValueError: If re and im differ in shape.
+    """
+    re = np.ascontiguousarray(re, dtype=np.float64)
+    im = np.ascontiguousarray(im, dtype=np.float64)
+    # The compiled kernels do not check bounds
+    if re.shape != im.shape:
+        raise ValueError(f"re and im differ in shape: {re.shape} and {im.shape}")
+    if out is None or out.shape != re.shape or out.dtype != re.dtype:
+        out = np.empty_like(re)
+    if use_numba and _magnitude_db_numba is not None:
+        _magnitude_db_numba(re, im, out)
+        return out
+    if _magnitude_db_cython is not None:
+        _magnitude_db_cython(re, im, out)
+        return out
+    # 10 * log10(sqrt(x)) == 5 * log10(x), no need to take the square root.
+    # Computed in place in out, only im * im needs a temporary array.
+    np.multiply(re, re, out=out)
+    np.add(out, im * im, out=out)
+    np.maximum(out, 1e-30, out=out)
+    np.log10(out, out=out)
+    np.multiply(out, 5.0, out=out)
+    return out
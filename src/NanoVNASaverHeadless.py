@@ -3,25 +3,61 @@ from .Calibration import Calibration
 from .CalibrationGuide import CalibrationGuide
 from .Touchstone import Touchstone
 from .SweepWorker import SweepWorker
+from .SweepProcess import SweepProcess
+from .Magnitude import NUMBA_AVAILABLE, magnitude_db
 from datetime import datetime
+import asyncio
 import threading
+import itertools
+import queue
 import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
 import numpy as np
 import csv
 
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:
+    import pyqtgraph as pg
+except ImportError:
+    pg = None
+
+# Largest recording, in bytes of sweep data, that looped playback keeps in memory
+LOOP_CACHE_BYTES = 64 << 20
+
 
 class NanoVNASaverHeadless:
-    def __init__(self, vna_index=0, verbose=False, save_path="./Save.s2p"):
+    def __init__(
+        self,
+        vna_index=0,
+        verbose=False,
+        save_path="./Save.s2p",
+        use_process=False,
+        use_numba=False,
+    ):
         """Initialize a NanoVNASaverHeadless object.
 
         Args:
             vna_index (int): Number of NanoVNAs to connect, at the moment multiple VNAs are not supported. Defaults to 0.
             verbose (bool): Print information. Defaults to False.
             save_path (str): The path to save data to. Defaults to "./Save.s2p".
+            use_process (bool): Stream from a forked process instead of a thread, so the sweeping does not compete with the consumer for the GIL. Requires fork, i.e. not Windows. Defaults to False.
+            use_numba (bool): Calculate the magnitude with numba, which is only faster where numba can vectorize log10 (Intel SVML). Requires numba. Defaults to False.
         """
         self.verbose = verbose
         self.save_path = save_path
         self.playback_mode = False
+        self.use_process = use_process
+        if use_numba and not NUMBA_AVAILABLE:
+            print("numba is not installed, calculating the magnitude without it.")
+        self.use_numba = use_numba and NUMBA_AVAILABLE
+        self._sweep_process = None
+        self._live_stream = False  # The worker thread runs a live stream
+        self._fig = None  # Figure reused by plot(False)
+        self._ani = None  # Running animation of plot(True)
         try:
             self.iface = hw.get_interfaces()[vna_index]
         except IndexError:
@@ -37,6 +73,13 @@ class NanoVNASaverHeadless:
             self.CalibrationGuide = CalibrationGuide(
                 self.calibration, self.worker, verbose
             )
+            # One long lived thread runs the worker for all streams
+            self._run_event = threading.Event()
+            self._worker_idle = threading.Event()
+            self._worker_idle.set()
+            self._shutdown = False
+            self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
+            self.worker_thread.start()
             if self.verbose:
                 print("VNA is connected: ", self.vna.connected())
                 print("Firmware: ", self.vna.readFirmware())
@@ -75,15 +118,11 @@ class NanoVNASaverHeadless:
             print("Cannot set sweep in playback mode. Connect NanoVNA and restart.")
             return
         self.worker.sweep.update(start, stop, segments, points)
+        # Resize the sweep data and drop the cached segment frequencies
+        self.worker.init_data()
         if self.verbose:
-            print(
-                "Sweep set from "
-                + str(self.worker.sweep.start / 1e9)
-                + "e9"
-                + " to "
-                + str(self.worker.sweep.end / 1e9)
-                + "e9"
-            )
+            sweep = self.worker.sweep
+            print(f"Sweep set from {sweep.start / 1e9}e9 to {sweep.end / 1e9}e9")
 
     def single_sweep(self):
         if self.playback_mode:
@@ -93,28 +132,35 @@ class NanoVNASaverHeadless:
         self.worker.run()
         return self._get_data()
 
-    def stream_data(self, data_file=False):
+    def stream_data(self, data_file=False, with_id=False, wait=True):
         """Creates a data stream from the continuous sweeping. (Or a previously recorded file.)
 
         Args:
             data_file (string): Path to a previously recorded csv file to stream from. Defaults to False.
+            with_id (bool): Yield (sweep_id, data) where sweep_id counts the sweeps from 1. Defaults to False.
+            wait (bool): Wait for the next live sweep. If False, None is yielded when no new sweep is ready, e.g. to keep a GUI responsive. Defaults to True.
 
         Yields:
             list: Yields a list of data when new data is available.
         """
         if not data_file:
+            if self.playback_mode:
+                print("Cannot stream data from NanoVNA in playback mode. Connect NanoVNA and restart.")
+                return
             self._stream_data()
         try:
             if not data_file:
-                if self.playback_mode:
-                    print("Cannot stream data from NanoVNA in playback mode. Connect NanoVNA and restart.")
-                    return
-                stream = self._access_data()
+                stream = self._access_data(wait)
             else:
-                stream = self._csv_streamer(data_file)
-
-            for data in stream:
-                yield data  # Yield each piece of data as it comes
+                stream = enumerate(self._csv_streamer(data_file), 1)
+
+            for sweep in stream:
+                if sweep is None:
+                    yield None
+                    continue
+                # Yield each piece of data as it comes
+                sweep_id, data = sweep
+                yield (sweep_id, data) if with_id else data
         except Exception as e:
             if self.verbose:
                 print("Exception in data stream: ", e)
@@ -123,12 +169,84 @@ class NanoVNASaverHeadless:
                 print("Stopping worker.")
             self._stop_worker()
 
-    def _stream_data(self):
-        """Starts a thread for the sweep workers run function."""
+    async def stream_data_async(self, with_id=False):
+        """Creates a data stream from the continuous sweeping for use with asyncio.
+
+        Completed sweeps are handed from the sweep thread to the event loop, so
+        waiting for the next sweep does not block the loop. Always sweeps in the
+        worker thread, also if use_process is set.
+
+        Args:
+            with_id (bool): Yield (sweep_id, data) where sweep_id counts the sweeps from 1. Defaults to False.
+
+        Yields:
+            tuple: Yields the data when new data is available.
+        """
+        if self.playback_mode:
+            print("Cannot stream data from NanoVNA in playback mode. Connect NanoVNA and restart.")
+            return
+        loop = asyncio.get_running_loop()
+        sweeps = asyncio.Queue(maxsize=2)
+
+        def put_latest(sweep):
+            # The consumer is behind, replace the oldest sweep with this one.
+            if sweeps.full():
+                sweeps.get_nowait()
+            sweeps.put_nowait(sweep)
+
+        self.worker.on_sweep = lambda sweep: loop.call_soon_threadsafe(
+            put_latest, sweep
+        )
+        self._stream_data(use_process=False)
+        try:
+            while self.worker.running or not sweeps.empty():
+                try:
+                    sweep_id, data = await asyncio.wait_for(sweeps.get(), 0.1)
+                except asyncio.TimeoutError:
+                    continue
+                yield (sweep_id, data) if with_id else data
+        finally:
+            self.worker.on_sweep = None
+            if self.verbose:
+                print("Stopping worker.")
+            await loop.run_in_executor(None, self._stop_worker)
+
+    def _stream_data(self, use_process=None):
+        """Lets the worker thread (or process) start running continuous sweeps.
+
+        Args:
+            use_process (bool): Sweep in a separate process. Defaults to use_process of the instance.
+        """
         self.worker.sweep.set_mode("CONTINOUS")
-        # Start the worker in a new thread
-        self.worker_thread = threading.Thread(target=self.worker.run)
-        self.worker_thread.start()
+        # Do not hand out sweeps left from single sweeps or an earlier stream
+        self.worker.clear_sweeps()
+        if use_process is None:
+            use_process = self.use_process
+        if use_process:
+            self._sweep_process = SweepProcess(self.worker)
+            self._sweep_process.start()
+            return
+        # Mark as running here so the consumer does not race the thread start
+        self.worker.running = True
+        self._live_stream = True
+        self._worker_idle.clear()
+        self._run_event.set()
+
+    def _worker_loop(self):
+        """Runs the sweep worker each time a stream is started, until shut down."""
+        while True:
+            self._run_event.wait()
+            self._run_event.clear()
+            if self._shutdown:
+                return
+            try:
+                # The stream may already have been stopped again
+                if self.worker.running:
+                    self.worker.run()
+            except Exception as e:  # run() only raises in verbose mode
+                print("Exception in sweep worker: ", e)
+            finally:
+                self._worker_idle.set()
 
     def _csv_streamer(self, filename, data_points=5):
         """Stream previously recorded data from a csv file.
@@ -138,76 +256,105 @@ class NanoVNASaverHeadless:
             data_points (int): Number of lines that each sweep is stored as. Defaults to 5.
 
         Yields:
-            list: [refl_re, refl_im, thru_re, thru_im, freq]
+            list, np.ndarray: [refl_re, refl_im, thru_re, thru_im, freq]
         """
         try:
-            with open(filename) as f:
-                data = f.readlines()
-                package = []
-                counter = 0
-                for i, line in enumerate(data):
-                    if i != 0:
-                        package.append(
-                            [float(x) for x in line.replace("\n", "").split(", ")]
-                        )
-                        counter += 1
-                        if counter == data_points:
-                            yield package
-                            counter = 0
-                            package = []
+            if pd is not None:
+                # Let the pandas C parser read 100 sweeps at a time, a chunk per
+                # sweep is slower than plain Python for wide rows
+                with pd.read_csv(
+                    filename,
+                    skiprows=1,
+                    header=None,
+                    skipinitialspace=True,
+                    dtype=np.float64,
+                    # The default parser can be off by one ulp on 17 digit values
+                    float_precision="round_trip",
+                    chunksize=data_points * 100,
+                ) as reader:
+                    for chunk in reader:
+                        chunk = chunk.to_numpy()
+                        last = len(chunk) - data_points
+                        for start in range(0, last + 1, data_points):
+                            yield chunk[start : start + data_points]
+                return
+            with open(filename, buffering=1 << 20) as f:
+                next(f, None)  # Skip the header
+                while True:
+                    lines = list(itertools.islice(f, data_points))
+                    if len(lines) < data_points:
+                        return
+                    # Parse the whole sweep with one call to the NumPy parser
+                    yield np.loadtxt(lines, delimiter=",", ndmin=2)
         except Exception as e:
             print(e)
 
-    def _access_data(self):
+    def _access_data(self, wait=True):
         """Fetches the data from the sweep worker as long as it is running a sweep.
 
+        Args:
+            wait (bool): Wait for each sweep, otherwise yield None while there is no new sweep. Defaults to True.
+
         Yields:
-            list: List of data from the latest sweep.
+            tuple: Sweep id and data from each completed sweep.
         """
-        # Access data while the worker is running
+        if self._sweep_process is not None:
+            yield from self._sweep_process.sweeps(wait)
+            return
+        # Look for completed sweeps while the worker is running
         while self.worker.running:
-            yield self._get_data()
+            try:
+                if wait:
+                    data = self.worker.sweeps.get(timeout=0.1)
+                else:
+                    data = self.worker.sweeps.get_nowait()
+            except queue.Empty:
+                if not wait:
+                    yield None
+                continue
+            yield data
 
     def _stop_worker(self):
         """Stop the sweep worker and kill the stream."""
         if self.verbose:
             print("NanoVNASaverHeadless is stopping sweepworker now.")
-        if not self.playback_mode:
-            self.worker.running = False
-            self.worker_thread.join()
+        if self._sweep_process is not None:
+            self._sweep_process.stop()
+            self._sweep_process = None
+        elif self._live_stream:
+            self.worker.stop()
+            self._worker_idle.wait()
+            # Only the sweep reads should be aborted, not the following commands
+            self.vna.abort.clear()
+            self._live_stream = False
 
     def _get_data(self):
         """Get data from the sweep worker.
 
         Returns:
-            list: Real Reflection, Imaginary Reflection, Real Through, Imaginary Through, Frequency
+            tuple: Real Reflection, Imaginary Reflection, Real Through, Imaginary Through, Frequency
         """
-        data_s11 = self.worker.data11
-        data_s21 = self.worker.data21
-        refl_re = []
-        refl_im = []
-        thru_re = []
-        thru_im = []
-        freq = []
-        for datapoint in data_s11:
-            refl_re.append(datapoint.re)
-            refl_im.append(datapoint.im)
-            freq.append(datapoint.freq)
-        for datapoint in data_s21:
-            thru_re.append(datapoint.re)
-            thru_im.append(datapoint.im)
-        return refl_re, refl_im, thru_re, thru_im, freq
-
-    def plot(self, animate, data_file=False, loop=False):
+        return self.worker.snapshot()
+
+    def plot(
+        self, animate, data_file=False, loop=False, disp_skip=1, backend="matplotlib"
+    ):
         """Show a magnitude plot from the data. If animate is True it will update the plot continuously with data from live stream or previously recorded file.
 
         Args:
             animate (bool): If the stream should be from a single sweep or continuous stream.
             data_file (bool, str): Pass a filepath to show previously recorded stream. Defaults to False.
             loop (bool): Loop the stream from the datafile. Defaults to False.
+            disp_skip (int): Only update the animated plot every disp_skip sweep. Defaults to 1.
+            backend (str): "matplotlib" or "pyqtgraph", the latter is much faster for animated plots. Defaults to "matplotlib".
         """
-        if animate:
-            plt.ion()
+        if animate and disp_skip < 1:
+            print("Nothing to show, disp_skip must be at least 1.")
+        elif animate and not data_file and self.playback_mode:
+            print("Cannot stream data from NanoVNA in playback mode. Connect NanoVNA and restart.")
+        elif animate and backend == "pyqtgraph":
+            self._plot_pyqtgraph(data_file, loop, disp_skip)
+        elif animate:
             fig, ax = plt.subplots(2, 1)
             fig.tight_layout(pad=4.0)
 
@@ -218,32 +365,83 @@ class NanoVNASaverHeadless:
             # Initialize lines for each subplot
             (line1,) = ax[0].plot([], [], label="S11")
             (line2,) = ax[1].plot([], [], label="S21")
+            lines = (line1, line2)
 
             # Display legend for each subplot
             ax[0].legend()
             ax[1].legend()
-            plt.show()
-            run = True
-            while run:
-                data = self.stream_data(data_file)
-                for new_data in data:
-                    s11 = self.magnitude(new_data[0], new_data[1])
-                    s21 = self.magnitude(new_data[2], new_data[3])
-                    x = new_data[4]
-                    line1.set_data(x, s11)
-                    line2.set_data(x, s21)
-
-                    # Update limits and redraw the plot
-                    for ax_item in ax.flat:
-                        ax_item.relim()  # Recalculate limits
-                        ax_item.autoscale_view()  # Autoscale
 
+            # Output buffers reused for every frame
+            s11 = s21 = None
+            # The x limits that were set last, matplotlib widens a single point
+            xlim = None
+
+            def set_data(new_data):
+                nonlocal s11, s21, xlim
+                s11 = self.magnitude(new_data[0], new_data[1], s11)
+                s21 = self.magnitude(new_data[2], new_data[3], s21)
+                x = new_data[4]
+                line1.set_data(x, s11)
+                line2.set_data(x, s21)
+
+                # Setting limits is expensive, so only do it when the sweep range
+                # changes or the data no longer fits the current y limits. Tell if
+                # they changed.
+                changed = False
+                if xlim != (x[0], x[-1]):
+                    xlim = (x[0], x[-1])
+                    for ax_item in ax:
+                        ax_item.set_xlim(*xlim)
+                    changed = True
+                for ax_item, y in zip(ax, (s11, s21)):
+                    bottom, top = ax_item.get_ylim()
+                    low, high = np.min(y), np.max(y)
+                    margin = max(0.1 * (high - low), 0.5)
+                    new_bottom, new_top = low - margin, high + margin
+                    # Widen when the data leaves the limits, but only shrink when
+                    # the data needs less than half of the range, so noise does
+                    # not rescale every frame
+                    if (
+                        low < bottom
+                        or high > top
+                        or new_top - new_bottom < 0.5 * (top - bottom)
+                    ):
+                        ax_item.set_ylim(new_bottom, new_top)
+                        changed = True
+                return changed
+
+            def update(new_data):
+                # No new live sweep yet
+                if new_data is None:
+                    return lines
+                # Blitting only redraws the lines, so the whole figure has to be
+                # redrawn if the limits changed
+                if set_data(new_data):
                     fig.canvas.draw()
-                    fig.canvas.flush_events()
-                    plt.pause(0.01)
-                run = data_file and loop
-                if self.verbose:
-                    print("Looped the animation.")
+                return lines
+
+            frames = self._plot_frames(data_file, loop, disp_skip)
+            if data_file:
+                # Start from the first sweep so the first draw has the right limits
+                first_data = next(frames, None)
+                if first_data is None:
+                    plt.close(fig)
+                    return
+                set_data(first_data)
+
+            # Keep a reference, the animation stops if it is garbage collected
+            self._ani = FuncAnimation(
+                fig,
+                update,
+                frames=frames,
+                init_func=lambda: lines,
+                blit=True,
+                cache_frame_data=False,
+                interval=10,
+            )
+            plt.show()
+            frames.close()
+            self._ani = None
 
         else:
             if self.playback_mode:
@@ -258,36 +456,146 @@ class NanoVNASaverHeadless:
             y1 = magnitudeS11
             y2 = magnitudeS21
 
-            fig, ax = plt.subplots(2, 1)
-            fig.tight_layout(pad=4.0)
+            # Reuse the figure from the previous call as long as it is still open
+            if self._fig is None or not plt.fignum_exists(self._fig.number):
+                self._fig, self._ax = plt.subplots(2, 1)
+                self._fig.tight_layout(pad=4.0)
 
-            # plot 1
-            ax[0].plot(x, y1, label="S11")
-            ax[0].legend()
+                # plot 1
+                (self._line1,) = self._ax[0].plot(x, y1, label="S11")
+                self._ax[0].legend()
 
-            # plot 2
-            ax[1].plot(x, y2, label="S21")
-            ax[1].legend()
+                # plot 2
+                (self._line2,) = self._ax[1].plot(x, y2, label="S21")
+                self._ax[1].legend()
 
-            for ax in ax.flat:
-                ax.set(xlabel="Frequency (Hz)", ylabel="dB")
+                for ax_item in self._ax.flat:
+                    ax_item.set(xlabel="Frequency (Hz)", ylabel="dB")
+            else:
+                self._line1.set_data(x, y1)
+                self._line2.set_data(x, y2)
+                for ax_item in self._ax.flat:
+                    ax_item.relim()
+                    ax_item.autoscale_view()
 
             plt.show()
 
-    def magnitude(self, re_list, im_list):
+    def _plot_pyqtgraph(self, data_file, loop, disp_skip):
+        """Continuously update a magnitude plot using pyqtgraph.
+
+        Args:
+            data_file (bool, str): Pass a filepath to show previously recorded stream.
+            loop (bool): Loop the stream from the datafile.
+            disp_skip (int): Only update the plot every disp_skip sweep.
+        """
+        if pg is None:
+            print("pyqtgraph is not installed, use the matplotlib backend instead.")
+            return
+        app = pg.mkQApp("NanoVNASaverHeadless")
+        win = pg.GraphicsLayoutWidget(show=True, title="NanoVNASaverHeadless")
+        curves = []
+        for row, label in enumerate(("S11", "S21")):
+            plot_item = win.addPlot(row=row, col=0)
+            plot_item.addLegend()
+            plot_item.setLabel("bottom", "Frequency", units="Hz")
+            plot_item.setLabel("left", "dB")
+            curves.append(plot_item.plot(name=label))
+        curve1, curve2 = curves
+
+        s11 = s21 = None
+        frames = self._plot_frames(data_file, loop, disp_skip)
+
+        def update():
+            nonlocal s11, s21
+            try:
+                new_data = next(frames)
+            except StopIteration:
+                # Keep showing the last sweep until the window is closed
+                timer.stop()
+                return
+            # No new live sweep yet
+            if new_data is None:
+                return
+            x = new_data[4]
+            s11 = self.magnitude(new_data[0], new_data[1], s11)
+            s21 = self.magnitude(new_data[2], new_data[3], s21)
+            curve1.setData(x, s11)
+            curve2.setData(x, s21)
+
+        # Poll for frames from the event loop, so the window stays responsive
+        # between live sweeps. Recordings are played back as fast as possible.
+        timer = pg.QtCore.QTimer()
+        timer.timeout.connect(update)
+        timer.start(0 if data_file else 10)
+        app.exec()
+        timer.stop()
+        frames.close()
+
+    def _plot_frames(self, data_file, loop, disp_skip):
+        """Data for the animated plots.
+
+        Args:
+            data_file (bool, str): Pass a filepath to show previously recorded stream.
+            loop (bool): Loop the stream from the datafile.
+            disp_skip (int): Only yield every disp_skip sweep.
+
+        Yields:
+            list: Data from the stream, or None while the next live sweep is not ready.
+        """
+        if not data_file:
+            # Do not wait for live sweeps, the plot has to stay responsive
+            sweeps = 0
+            for data in self.stream_data(wait=False):
+                if data is not None:
+                    sweeps += 1
+                    # Skip sweeps in the generator rather than in the drawing code
+                    if (sweeps - 1) % disp_skip:
+                        continue
+                yield data
+            return
+        # Skip sweeps in the generator rather than in the drawing code
+        frames = itertools.islice(self.stream_data(data_file), 0, None, disp_skip)
+        if not loop:
+            yield from frames
+            return
+        # Keep the sweeps from the first pass, so looping does not read and parse
+        # the file again, unless the recording is too large to keep in memory
+        sweeps = []
+        size = 0
+        for data in frames:
+            if sweeps is not None:
+                # Copy, a sweep can be a view that keeps a whole parsed chunk alive
+                data = np.array(data, dtype=np.float64)
+                size += data.nbytes
+                if size > LOOP_CACHE_BYTES:
+                    sweeps = None
+                else:
+                    sweeps.append(data)
+            yield data
+        if sweeps == []:
+            return
+        while True:
+            if self.verbose:
+                print("Looped the animation.")
+            if sweeps is not None:
+                yield from sweeps
+            else:
+                yield from itertools.islice(
+                    self.stream_data(data_file), 0, None, disp_skip
+                )
+
+    def magnitude(self, re_list, im_list, out=None):
         """Function to get the magnitude and prepare for plotting.
 
         Args:
-            re_list (list): List with real parts.
-            im_list (list): List with imaginary parts.
+            re_list (list, np.ndarray): Real parts.
+            im_list (list, np.ndarray): Imaginary parts.
+            out (np.ndarray, optional): Reuse this buffer for the result if it fits.
 
         Returns:
-            list: List with the magnitude.
+            np.ndarray: The magnitude.
         """
-        mag_list = []
-        for re, im in zip(re_list, im_list):
-            mag_list.append(10 * np.log10(np.sqrt(re**2 + im**2)))
-        return mag_list
+        return magnitude_db(re_list, im_list, out, self.use_numba)
 
     def save_csv(self, filename, nr_sweeps=10, skip_start=5):
         """Function to save the stream to a csv file.
@@ -303,6 +611,9 @@ class NanoVNASaverHeadless:
         if self.playback_mode:
             print("Cannot run sweeps in playback mode. Connect NanoVNA and restart.")
             return
+        if nr_sweeps < 1:
+            print("Nothing to save, nr_sweeps must be at least 1.")
+            return
         try:
             if not isinstance(filename, str):
                 raise TypeError("Filename must be a string")
@@ -310,25 +621,23 @@ class NanoVNASaverHeadless:
             if not filename.endswith(".csv"):
                 filename += ".csv"
             file_path = filename
-            old_data = None
-            # Counter because NanoVNA sends out incorrect data the first few times
-            counter = 0
+            saved = 0
             if self.verbose:
                 print("Starting to save...")
-            with open(file_path, mode="w", newline="") as file:
+            with open(file_path, mode="w", newline="", buffering=1 << 20) as file:
                 writer = csv.writer(file)
-                writer.writerow("ReflRe", " ReflIm", " ThruRe", " ThruIm", " Freq")
-                data_stream = self.stream_data()
-                for new_data in data_stream:
-                    if new_data != old_data:
-                        for data in new_data:
-                            if (
-                                counter > skip_start
-                                and counter < skip_start + nr_sweeps
-                            ):
-                                writer.writerow(data)
-                        old_data = new_data
-                        counter += 1
+                writer.writerow(["ReflRe", " ReflIm", " ThruRe", " ThruIm", " Freq"])
+                for sweep_id, new_data in self.stream_data(with_id=True):
+                    # NanoVNA sends out incorrect data the first few times
+                    if sweep_id <= skip_start:
+                        continue
+                    # One row per field, 17 digits read back as the same float64
+                    np.savetxt(
+                        file, new_data, fmt="%.17g", delimiter=",", newline="\r\n"
+                    )
+                    saved += 1
+                    if saved == nr_sweeps:
+                        break
                 if self.verbose:
                     print("Done!")
         except Exception as e:
@@ -344,6 +653,9 @@ class NanoVNASaverHeadless:
             print("Cannot kill in playback mode. Connect NanoVNA and restart.")
             return
         self._stop_worker()
+        self._shutdown = True
+        self._run_event.set()
+        self.worker_thread.join()
         self.vna.disconnect()
         if self.vna.connected():
             raise Exception("The VNA was not successfully disconnected.")
@@ -0,0 +1,94 @@
+import multiprocessing
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SweepProcess:
+    """Runs continuous sweeps of a SweepWorker in a separate process.
+
+    The process is forked, so it shares the connected VNA and the calibration
+    of the worker at the time it is started. Completed sweeps are written to a
+    shared memory block together with a sweep id, which keeps the sweeping from
+    contending for the GIL with the consumer.
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        context = multiprocessing.get_context("fork")
+        size = len(worker.freq)
+        values_size = worker.values.nbytes
+        # Rows refl_re, refl_im, thru_re, thru_im, followed by the frequencies
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(values_size + worker.freq.nbytes, 1)
+        )
+        self._values = np.ndarray(
+            (4, size), dtype=worker.values.dtype, buffer=self._shm.buf
+        )
+        self._freq = np.ndarray(
+            size, dtype=worker.freq.dtype, buffer=self._shm.buf, offset=values_size
+        )
+        self._sweep_id = context.Value("q", 0, lock=False)
+        self._condition = context.Condition()
+        self._stop = context.Event()
+        self._process = context.Process(target=self._run, daemon=True)
+
+    def start(self):
+        self._process.start()
+
+    def stop(self):
+        """Stop sweeping and release the shared memory."""
+        self._stop.set()
+        self._process.join()
+        self._values = self._freq = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def sweeps(self, wait=True):
+        """Wait for sweeps from the process as long as it is running.
+
+        Args:
+            wait (bool): Wait for each sweep, otherwise yield None while there is no new sweep. Defaults to True.
+
+        Yields:
+            tuple: Sweep id and data from each completed sweep.
+        """
+        last_id = 0
+        while True:
+            with self._condition:
+                if wait and self._sweep_id.value == last_id:
+                    self._condition.wait(0.1)
+                sweep_id = self._sweep_id.value
+                if sweep_id != last_id:
+                    data = (*self._values.copy(), self._freq.copy())
+            if sweep_id == last_id:
+                if not self._process.is_alive():
+                    return
+                if not wait:
+                    yield None
+                continue
+            last_id = sweep_id
+            yield sweep_id, data
+
+    def _run(self):
+        """Sweep in the forked process and copy the sweeps to shared memory."""
+        worker = self.worker
+        worker.running = True
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        while worker.running:
+            if self._stop.is_set():
+                worker.stop()
+                break
+            try:
+                sweep_id, data = worker.sweeps.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            with self._condition:
+                self._values[:] = data[:4]
+                self._freq[:] = data[4]
+                self._sweep_id.value = sweep_id
+                self._condition.notify_all()
+        thread.join()
@@ -18,13 +18,23 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from operator import attrgetter
 from time import sleep
+import io
+import os
+import queue
 import numpy as np
 import threading
 from .RFTools import corr_att_data
 from .Sweep import Sweep
 from .RFTools import Datapoint
 
+_FREQ = attrgetter("freq")
+_RE = attrgetter("re")
+_IM = attrgetter("im")
+
 
 def truncate(values: list[list[tuple]], count: int, verbose=False) -> list[list[tuple]]:
     """truncate drops extrema from data list if averaging is active"""
@@ -35,13 +45,12 @@ def truncate(values: list[list[tuple]], count: int, verbose=False) -> list[list[
         if verbose:
             print("Not doing illegal truncate")
         return values
-    truncated = []
-    for valueset in np.swapaxes(values, 0, 1).tolist():
-        avg = complex(*np.average(valueset, 0))
-        truncated.append(
-            sorted(valueset, key=lambda v, a=avg: abs(a - complex(*v)))[:keep]
-        )
-    return np.swapaxes(truncated, 0, 1).tolist()
+    values = np.asarray(values, dtype=np.float64)
+    # Distance of each value to the average of its frequency point
+    deviation = values - np.average(values, 0)
+    distance = np.hypot(deviation[..., 0], deviation[..., 1])
+    closest = np.argsort(distance, axis=0, kind="stable")[:keep]
+    return np.take_along_axis(values, closest[..., np.newaxis], axis=0).tolist()
 
 
 class SweepWorker:
@@ -54,6 +63,10 @@ class SweepWorker:
         self.data21: list[Datapoint] = []
         self.rawData11: list[Datapoint] = []
         self.rawData21: list[Datapoint] = []
+        self.segmentFrequencies: dict[tuple[int, int], list[int]] = {}
+        self.freq = np.empty(0)
+        self.values = np.empty((4, 0))
+        self.re11, self.im11, self.re21, self.im21 = self.values
         self.verbose = verbose
         self.vna = vna
         self.calibration = calibration
@@ -63,6 +76,15 @@ class SweepWorker:
         self.error_message = ""
         self.offsetDelay = 0
         self.dataLock = threading.Lock()
+        # (sweep_id, data) of completed sweeps, the oldest is dropped when full.
+        self.sweeps: queue.Queue = queue.Queue(maxsize=2)
+        self.sweep_id = 0
+        # Optional callable, called with (sweep_id, data) of every completed sweep
+        self.on_sweep = None
+        # Thread calibrating and storing segments, created on the first run
+        self._processing = None
+        self._processing_pid = None
+        self._pending = None
         self.s21att = 0.0
 
     def saveData(
@@ -78,11 +100,19 @@ class SweepWorker:
         try:
             self._run()
         except BaseException as exc:  # pylint: disable=broad-except
+            self.running = False
             print("%s", exc)
             print(f"ERROR during sweep\n\nStopped\n\n{exc}")
             if self.verbose:
                 raise exc
 
+    def stop(self) -> None:
+        """Stop sweeping without waiting for a pending read from the VNA."""
+        # The VNA gives up reading between lines or chunks of data. Set it first,
+        # so a run that ends now cannot clear it before it is set.
+        self.vna.abort.set()
+        self.running = False
+
     def _run(self) -> None:
         if self.verbose:
             print("Initializing SweepWorker")
@@ -93,7 +123,9 @@ class SweepWorker:
             return
 
         self.running = True
+        self.vna.abort.clear()
         self.percentage = 0
+        self.clear_sweeps()
 
         sweep = self.sweep.copy()
 
@@ -101,7 +133,19 @@ class SweepWorker:
             self.sweep = sweep
             self.init_data()
 
-        self._run_loop()
+        # Calibrating and storing a segment runs on its own thread, overlapping
+        # with reading the next segment from the VNA. A single thread keeps the
+        # segments and the published sweeps in order. It serves every run, but
+        # a forked SweepProcess does not inherit it and starts its own.
+        if self._processing_pid != os.getpid():
+            self._processing = ThreadPoolExecutor(max_workers=1)
+            self._processing_pid = os.getpid()
+        try:
+            self._run_loop()
+        finally:
+            # Let the following commands through if the sweep was stopped
+            self.vna.abort.clear()
+            self._wait_processing()
 
         if sweep.segments > 1:
             start = sweep.start
@@ -137,20 +181,78 @@ class SweepWorker:
                     start, stop, averages
                 )
                 self.percentage = (i + 1) * 100 / sweep.segments
-                self.updateData(freq, values11, values21, i)
+                self._process(self.updateData, freq, values11, values21, i)
+            if self.running:
+                self._process(self._publish_sweep)
             if sweep.properties.mode != "CONTINOUS" or not self.running:
                 break
 
+    def _process(self, func, *args) -> None:
+        """Run func on the processing thread once the previous step finished.
+
+        Only one step is in flight while the next segment is read, and a step
+        that failed raises here, stopping the sweep.
+
+        Args:
+            func (callable): Processing step.
+            *args: Arguments to func.
+        """
+        self._wait_processing()
+        self._pending = self._processing.submit(func, *args)
+
+    def _wait_processing(self) -> None:
+        """Wait for the pending processing step, raising the error it raised."""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            pending.result()
+
+    def snapshot(self):
+        """Copy the current sweep data.
+
+        Returns:
+            tuple: Real Reflection, Imaginary Reflection, Real Through, Imaginary Through, Frequency
+        """
+        re11, im11, re21, im21 = self.values.copy()
+        return re11, im11, re21, im21, self.freq.copy()
+
+    def _publish_sweep(self) -> None:
+        self.sweep_id += 1
+        snapshot = (self.sweep_id, self.snapshot())
+        try:
+            self.sweeps.put_nowait(snapshot)
+        except queue.Full:
+            # The consumer is behind, replace the oldest sweep with this one.
+            with suppress(queue.Empty):
+                self.sweeps.get_nowait()
+            self.sweeps.put_nowait(snapshot)
+        if self.on_sweep is not None:
+            self.on_sweep(snapshot)
+
+    def clear_sweeps(self) -> None:
+        """Drop the published sweeps and count the sweeps from 1 again."""
+        self.sweep_id = 0
+        with suppress(queue.Empty):
+            while True:
+                self.sweeps.get_nowait()
+
     def init_data(self):
         self.data11 = []
         self.data21 = []
         self.rawData11 = []
         self.rawData21 = []
+        self.segmentFrequencies = {}
         for freq in self.sweep.get_frequencies():
             self.data11.append(Datapoint(freq, 0.0, 0.0))
             self.data21.append(Datapoint(freq, 0.0, 0.0))
             self.rawData11.append(Datapoint(freq, 0.0, 0.0))
             self.rawData21.append(Datapoint(freq, 0.0, 0.0))
+        # The calibrated data is also kept as separate arrays (SoA) so it can be
+        # handed to the consumers without walking the Datapoint lists. The
+        # re/im arrays are rows of one block so a sweep is copied in one go.
+        size = len(self.data11)
+        self.freq = np.array([dp.freq for dp in self.data11], dtype=np.float64)
+        self.values = np.zeros((4, size))
+        self.re11, self.im11, self.re21, self.im21 = self.values
         if self.verbose:
             print("Init data length: %s", len(self.data11))
 
@@ -172,11 +274,17 @@ class SweepWorker:
         data11, data21 = self.applyCalibration(raw_data11, raw_data21)
         if self.verbose:
             print("update Freqs: %s, Offset: %s", len(frequencies), offset)
-        for i in range(len(frequencies)):
-            self.data11[offset + i] = data11[i]
-            self.data21[offset + i] = data21[i]
-            self.rawData11[offset + i] = raw_data11[i]
-            self.rawData21[offset + i] = raw_data21[i]
+        count = len(frequencies)
+        end = offset + count
+        self.data11[offset:end] = data11
+        self.data21[offset:end] = data21
+        self.rawData11[offset:end] = raw_data11
+        self.rawData21[offset:end] = raw_data21
+        self.freq[offset:end] = np.fromiter(map(_FREQ, data11), np.float64, count)
+        self.re11[offset:end] = np.fromiter(map(_RE, data11), np.float64, count)
+        self.im11[offset:end] = np.fromiter(map(_IM, data11), np.float64, count)
+        self.re21[offset:end] = np.fromiter(map(_RE, data21), np.float64, count)
+        self.im21[offset:end] = np.fromiter(map(_IM, data21), np.float64, count)
 
         if self.verbose:
             print(
@@ -238,10 +346,14 @@ class SweepWorker:
             retry = 0
             tmp11 = []
             tmp21 = []
-            while not tmp11 and retry < 5:
+            while len(tmp11) == 0 and retry < 5:
                 sleep(0.5 * retry)
                 retry += 1
                 freq, tmp11, tmp21 = self.readSegment(start, stop)
+                if len(tmp11) == 0 and not self.running:
+                    if self.verbose:
+                        print("Stopped during readSegment(%s,%s)", start, stop)
+                    return [], [], []
                 if retry > 1:
                     if self.verbose:
                         print("retry %s readSegment(%s,%s)", retry, start, stop)
@@ -272,15 +384,21 @@ class SweepWorker:
             print("Setting sweep range to %d to %d", start, stop)
         self.vna.setSweep(start, stop)
 
-        frequencies = self.vna.readFrequencies()
-        if self.verbose:
-            print("Read %s frequencies", len(frequencies))
+        # The frequencies of a segment do not change, only read them once
+        frequencies = self.segmentFrequencies.get((start, stop))
+        if frequencies is None:
+            frequencies = self.vna.readFrequencies()
+            if self.verbose:
+                print("Read %s frequencies", len(frequencies))
         values11 = self.readData("data 0")
-        values21 = self.readData("data 1")
+        # No need to wait for the second read if the first one failed or was aborted
+        values21 = self.readData("data 1") if len(values11) else []
         if not len(frequencies) == len(values11) == len(values21):
             if self.verbose:
                 print("No valid data during this run")
+            self.segmentFrequencies.pop((start, stop), None)
             return [], [], []
+        self.segmentFrequencies[(start, stop)] = frequencies
         return frequencies, values11, values21
 
     def readData(self, data):
@@ -295,21 +413,23 @@ class SweepWorker:
             tmpdata = self.vna.readValues(data)
             if self.verbose:
                 print("Read %d values", len(tmpdata))
-            for d in tmpdata:
-                a, b = d.split(" ")
+            if tmpdata:
                 try:
-                    if self.vna.validateInput and (
-                        abs(float(a)) > 9.5 or abs(float(b)) > 9.5
-                    ):
+                    values = np.loadtxt(io.StringIO("\n".join(tmpdata)), ndmin=2)
+                    if values.shape[1] != 2:
+                        raise ValueError(f"expected 2 columns, got {values.shape[1]}")
+                    if self.vna.validateInput and np.any(np.abs(values) > 9.5):
                         if self.verbose:
-                            print("Got a non plausible data value: (%s)", d)
+                            print("Got a non plausible data value in %s", data)
                         done = False
-                        break
-                    returndata.append((float(a), float(b)))
+                    else:
+                        returndata = values
                 except ValueError as exc:
                     print("An exception occurred reading %s: %s", data, exc)
                     done = False
             if not done:
+                if not self.running:
+                    break
                 if self.verbose:
                     print("Re-reading %s", data)
                 sleep(0.2)
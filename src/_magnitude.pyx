@@ -0,0 +1,14 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+from libc.math cimport log10
+
+
+def magnitude_db(const double[::1] re, const double[::1] im, double[::1] out):
+    """Calculate 10 * log10(|z|) = 5 * log10(re^2 + im^2) into out."""
+    cdef Py_ssize_t i, n = re.shape[0]
+    cdef double x
+    # Indexing is unchecked, so the lengths have to be
+    if im.shape[0] != n or out.shape[0] != n:
+        raise ValueError("re, im and out must have the same length")
+    for i in range(n):
+        x = re[i] * re[i] + im[i] * im[i]
+        out[i] = 5.0 * log10(x if x > 1e-30 else 1e-30)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src import Magnitude
+from src.Magnitude import magnitude_db
+
+BACKENDS = ["numpy", "cython", "numba"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    """Select the backend magnitude_db dispatches to.
+
+    Returns:
+        dict: Keyword arguments for magnitude_db.
+    """
+    if request.param == "numpy":
+        monkeypatch.setattr(Magnitude, "_magnitude_db_cython", None)
+    elif request.param == "cython" and Magnitude._magnitude_db_cython is None:
+        pytest.skip("Cython kernel is not built")
+    elif request.param == "numba":
+        if not Magnitude.NUMBA_AVAILABLE:
+            pytest.skip("numba is not installed")
+        return {"use_numba": True}
+    return {}
+
+
+def test_magnitude_matches_reference(backend):
+    rng = np.random.default_rng(0)
+    re, im = rng.normal(size=(2, 1000))
+    # The existing scale is 10 * log10(|z|)
+    expected = 10 * np.log10(np.abs(re + 1j * im))
+    np.testing.assert_allclose(magnitude_db(re, im, **backend), expected, rtol=1e-9)
+
+
+def test_magnitude_clamps_zero(backend):
+    result = magnitude_db(np.zeros(3), np.zeros(3), **backend)
+    np.testing.assert_allclose(result, -150.0)
+
+
+def test_magnitude_reuses_matching_out(backend):
+    out = np.empty(4)
+    assert magnitude_db(np.ones(4), np.ones(4), out, **backend) is out
+    assert magnitude_db(np.ones(5), np.ones(5), out, **backend) is not out
+
+
+def test_magnitude_rejects_mismatched_shapes(backend):
+    with pytest.raises(ValueError):
+        magnitude_db(np.ones(1000), np.ones(10), **backend)